@@ -57,7 +57,7 @@ query = "FROM Mask WHERE roi.image.id = :id"
 params = ParametersI()
 params.addId(image_id_src)
 
-count = 0
+rois_dst = []
 
 for mask_src in query_service.findAllByQuery(query, params):
     mask_dst = MaskI()
@@ -79,8 +79,11 @@ for mask_src in query_service.findAllByQuery(query, params):
     )
     roi_dst.image = ImageI(image_id_dst, False)
     roi_dst.addShape(mask_dst)
-    update_service.saveObject(roi_dst)
-    count += 1
+    rois_dst.append(roi_dst)
+
+# one round-trip for all the new ROIs instead of one per mask
+update_service.saveArray(rois_dst)
+count = len(rois_dst)
 
 idr._closeSession()
 local._closeSession()
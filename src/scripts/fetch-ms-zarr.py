@@ -21,12 +21,15 @@
 # author: m.t.b.carroll@dundee.ac.uk
 
 import itertools
-import json
 import os
 import requests
+import shutil
 import sys
 import argparse
 
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
 parser = argparse.ArgumentParser()
 parser.add_argument(
     "--dry-run",
@@ -55,6 +58,12 @@ parser.add_argument(
     action="store_true",
     help="Download into nested chunk path",
 )
+parser.add_argument(
+    "--max-workers",
+    type=int,
+    default=16,
+    help="How many chunks to download concurrently [%(default)s]",
+)
 parser.add_argument("image", type=int)
 args = parser.parse_args()
 
@@ -63,16 +72,41 @@ url = args.endpoint_url
 base_uri = args.url_format.format(image=image, url=url)
 server_chunk_separator = "/" if args.nested_remote else "."
 client_chunk_separator = "/" if args.nested_local else "."
+same_chunk_separator = server_chunk_separator == client_chunk_separator
+
+session = requests.Session()
+adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32)
+session.mount("http://", adapter)
+session.mount("https://", adapter)
+
+
+def check_chunk(chunk_uri):
+    response = session.head(chunk_uri)
+    return response.status_code == 200
+
 
-response = requests.get(base_uri + ".zgroup")
+def fetch_chunk(job):
+    chunk_uri, filename = job
+    with session.get(chunk_uri, stream=True) as response:
+        if response.status_code != 200:
+            return False
+        # undo any Content-Encoding, as response.content would
+        response.raw.decode_content = True
+        with open(filename, "wb") as file:
+            shutil.copyfileobj(response.raw, file, length=1 << 20)
+    return True
+
+
+response = session.get(base_uri + ".zgroup")
 if response.status_code == 200:
-    zgroup = response.json()
+    zgroup_raw = response.content
 else:
     print("no image found at {}".format(base_uri))
     sys.exit(2)
 
-response = requests.get(base_uri + ".zattrs")
+response = session.get(base_uri + ".zattrs")
 if response.status_code == 200:
+    zattrs_raw = response.content
     zattrs = response.json()
 else:
     print("no image found at {}".format(base_uri))
@@ -90,9 +124,12 @@ for dataset in datasets:
     dataset_path = dataset["path"] + "/"
     dataset_uri = base_uri + dataset_path
     local_prefix = dataset_path if is_multiscale else ""
+    if local_prefix:
+        os.makedirs(local_prefix, exist_ok=True)
 
-    response = requests.get(dataset_uri + ".zarray")
+    response = session.get(dataset_uri + ".zarray")
     if response.status_code == 200:
+        zarray_raw = response.content
         zarray = response.json()
     else:
         print("no resolution found at {}".format(dataset_uri))
@@ -101,30 +138,46 @@ for dataset in datasets:
     shape = zarray["shape"]
     chunks = zarray["chunks"]
     ranges = [range(0, -(-s // c)) for (s, c) in zip(shape, chunks)]
-    for chunk in itertools.product(*ranges):
-        chunk_name_server = server_chunk_separator.join(map(str, chunk))
-        chunk_name_client = client_chunk_separator.join(map(str, chunk))
+    axis_names = [[str(i) for i in r] for r in ranges]
+    downloads = []
+    checks = []
+    directories = set()
+    for chunk in itertools.product(*axis_names):
+        chunk_name_server = server_chunk_separator.join(chunk)
+        chunk_name_client = (
+            chunk_name_server
+            if same_chunk_separator
+            else client_chunk_separator.join(chunk)
+        )
         if args.dry_run:
-            response = requests.head(dataset_uri + chunk_name_server)
-            if response.status_code != 200:
-                print("check failed for chunk {}".format(chunk_name_server))
-                sys.exit(2)
+            checks.append(dataset_uri + chunk_name_server)
             continue
 
-        response = requests.get(dataset_uri + chunk_name_server)
-        if response.status_code == 200:
-            filename = local_prefix + chunk_name_client
-            parent_dir = os.path.dirname(filename)
-            if parent_dir:
-                os.makedirs(parent_dir, exist_ok=True)
-            with open(filename, "wb") as file:
-                file.write(response.content)
-        else:
-            print("failed to fetch chunk {}".format(chunk_name_server))
-            sys.exit(2)
+        filename = local_prefix + chunk_name_client
+        parent_dir = os.path.dirname(filename)
+        if parent_dir:
+            directories.add(parent_dir)
+        downloads.append((dataset_uri + chunk_name_server, filename))
+
+    for parent_dir in directories:
+        os.makedirs(parent_dir, exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=args.max_workers) as executor:
+        for chunk_uri, ok in zip(checks, executor.map(check_chunk, checks)):
+            if not ok:
+                print("check failed for chunk {}".format(chunk_uri))
+                sys.exit(2)
+        results = executor.map(fetch_chunk, downloads)
+        for (chunk_uri, filename), ok in zip(downloads, results):
+            if not ok:
+                print("failed to fetch chunk {}".format(chunk_uri))
+                sys.exit(2)
 
-    print(json.dumps(zarray), file=open(local_prefix + ".zarray", "w"))
+    with open(local_prefix + ".zarray", "wb") as file:
+        file.write(zarray_raw)
 
 if is_multiscale:
-    print(json.dumps(zgroup), file=open(".zgroup", "w"))
-    print(json.dumps(zattrs), file=open(".zattrs", "w"))
+    with open(".zgroup", "wb") as file:
+        file.write(zgroup_raw)
+    with open(".zattrs", "wb") as file:
+        file.write(zattrs_raw)
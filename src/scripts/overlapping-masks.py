@@ -43,6 +43,7 @@ image_id_dst = ns.target_image
 local = BlitzGateway(ns.to_user, ns.to_pass, host=ns.to_host, secure=True)
 
 local.connect()
+local.c.enableKeepAlive(60)
 
 query_service = local.getQueryService()
 update_service = local.getUpdateService()
@@ -57,18 +58,20 @@ image = query_service.findByQuery(query, params)
 
 
 def make_circle(h, w):
-    x = np.arange(0, w)
-    y = np.arange(0, h)
-    arr = np.zeros((y.size, x.size), dtype=bool)
-
     cx = w // 2
     cy = h // 2
-    r = min(w, h) // 2
+    r2 = (min(w, h) // 2) ** 2
 
-    mask = (x[np.newaxis, :] - cx) ** 2 + (y[:, np.newaxis] - cy) ** 2 < r ** 2
-    arr[mask] = 1
-    arr = np.packbits(arr)
-    return arr
+    # square the two open grid axes in place before broadcasting
+    y, x = np.ogrid[:h, :w]
+    dx = x - cx
+    dx *= dx
+    dy = y - cy
+    dy *= dy
+    mask = dx + dy < r2
+    # OMERO expects one contiguous big-endian bit stream, so pack the
+    # flattened mask: axis-wise packing would pad each row to a byte
+    return np.packbits(mask.view(np.uint8), bitorder="big")
 
 
 def make_mask(x, y, h, w):
@@ -83,10 +86,15 @@ def make_mask(x, y, h, w):
     roi.description = rstring("created by overlapping-masks.py")
     roi.addShape(mask)
     roi.image = image
-    roi = update_service.saveAndReturnObject(roi)
-    print(f"Roi:{roi.id.val}")
+    return roi
 
 
-make_mask(20, 20, 40, 40)
-make_mask(30, 30, 50, 50)
+rois = [
+    make_mask(20, 20, 40, 40),
+    make_mask(30, 30, 50, 50),
+]
+
+# one round-trip for all the new ROIs instead of one per mask
+for roi in update_service.saveAndReturnArray(rois):
+    print(f"Roi:{roi.id.val}")
 local._closeSession()
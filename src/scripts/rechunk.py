@@ -1,7 +1,10 @@
 #!/usr/bin/env python
 
+import dask
 import dask.array as da
+import zarr
 import argparse
+import math
 import time
 
 
@@ -22,17 +25,27 @@ def timeit(method):
 
 @timeit
 def load(source_array):
-    return da.from_zarr(source_array)
+    arr = da.from_zarr(source_array)
+    if any(math.isnan(c) for sizes in arr.chunks for c in sizes):
+        # resolve unknown chunk sizes once rather than mid-rechunk
+        arr = arr.compute_chunk_sizes()
+    return arr
 
 
 @timeit
-def resize(arr, chunks):
-    return arr.rechunk(chunks)
+def resize(arr, chunks, method=None):
+    if method is None:
+        return arr.rechunk(chunks)
+    return arr.rechunk(chunks, method=method)
 
 
 @timeit
-def convert(resized, target_array):
-    da.to_zarr(resized, target_array)
+def convert(resized, store, compressor=None):
+    # all-fill-value chunks are skipped rather than encoded and stored
+    kwargs = {"write_empty_chunks": False}
+    if compressor is not None:
+        kwargs["compressor"] = compressor
+    da.to_zarr(resized, store, **kwargs)
 
 
 def main():
@@ -58,8 +71,41 @@ def main():
         default="1,1,1,1024,1024",
         help=("comma-separated string of chunk sizes " "(e.g. %(default)s)"),
     )
+    parser.add_argument(
+        "--compressor",
+        choices=["zstd", "lz4", "default"],
+        default="zstd",
+        help="Blosc codec for the target array (%(default)s)",
+    )
+    parser.add_argument(
+        "--store",
+        choices=["dir", "zip"],
+        default="dir",
+        help=(
+            "write one file per chunk or a single zip archive (%(default)s)"
+        ),
+    )
+    parser.add_argument(
+        "--rechunk-method",
+        choices=["tasks", "p2p"],
+        default="tasks",
+        help=("rechunking algorithm; p2p needs --distributed (%(default)s)"),
+    )
+    parser.add_argument(
+        "--report",
+        metavar="FILE",
+        help="write a performance report HTML file (needs --distributed)",
+    )
     args = parser.parse_args()
 
+    if args.rechunk_method == "p2p" and not args.distributed:
+        parser.error("--rechunk-method p2p requires --distributed")
+    if args.report and not args.distributed:
+        parser.error("--report requires --distributed")
+    if args.store == "zip" and args.distributed:
+        # each worker would reopen the archive and interleave entries
+        parser.error("--store zip cannot be used with --distributed")
+
     if args.distributed:
         from dask.distributed import Client
 
@@ -71,7 +117,42 @@ def main():
     chunks = [int(x) for x in args.chunks.split(",")]
     assert len(chunks) == args.dimensions
 
-    convert(resize(load(args.source_array), chunks), args.target_array)
+    compressor = None
+    if args.compressor != "default":
+        from numcodecs import Blosc
+
+        compressor = Blosc(
+            cname=args.compressor, clevel=3, shuffle=Blosc.BITSHUFFLE
+        )
+
+    if args.store == "zip":
+        store = zarr.ZipStore(args.target_array, mode="w")
+    else:
+        store = zarr.storage.FSStore(args.target_array, auto_mkdir=True)
+
+    # "tasks" is dask's default algorithm: request it by omitting the
+    # method kwarg so dask versions predating the kwarg still work
+    method = None if args.rechunk_method == "tasks" else args.rechunk_method
+
+    def run():
+        convert(
+            resize(load(args.source_array), chunks, method=method),
+            store,
+            compressor=compressor,
+        )
+
+    try:
+        # fuse neighbouring tasks so the scheduler sees fewer, longer ones
+        with dask.config.set({"optimization.fuse.active": True}):
+            if args.report:
+                from dask.distributed import performance_report
+
+                with performance_report(filename=args.report):
+                    run()
+            else:
+                run()
+    finally:
+        store.close()
 
     if args.distributed:
         input("Press Enter to exit...")